@@ -1,43 +1,313 @@
 import os
 import io
 import uuid
+import math
+import sqlite3
+import threading
 import numpy as np
 import cv2
+import dlib
 import face_recognition
-import matplotlib.pyplot as plt
+import orjson
+import xxhash
+from numba import njit
+from PIL import Image, ImageDraw, ImageFont, UnidentifiedImageError
 from datetime import datetime
-from collections import defaultdict
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 from flask import Flask, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize responses with orjson; NumPy arrays and scalars are encoded natively."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 # --- CONFIG ---
 UPLOAD_FOLDER = "uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+DB_PATH = "attendance.db"
+DETECTION_SCALE = 2  # Frames are shrunk by this factor before face detection (2, 4 or 8)
+# HOG finds faces down to ~40px, so at 2x a 640x480 webcam frame still catches ~80px faces
+# libjpeg scales in the DCT domain, so the detection frame is decoded at reduced size directly
+DETECTION_IMREAD_FLAG = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                         8: cv2.IMREAD_REDUCED_COLOR_8}[DETECTION_SCALE]
+# Per-process encoding pool size; gunicorn.conf.py sets this to cpu_count // workers
+ENCODING_WORKERS = int(os.environ.get("ENCODING_WORKERS", os.cpu_count() or 1))
+SMALL_GALLERY = 200  # Below this many students the Numba kernel beats the BLAS call overhead
+FACE_MODEL = "cnn" if dlib.DLIB_USE_CUDA else "hog"  # CNN detector is only practical on GPU
+if not dlib.DLIB_USE_CUDA:
+    app.logger.warning("dlib was built without CUDA; using HOG detection on CPU. "
+                       "Rebuild dlib with -DDLIB_USE_CUDA=1 for GPU encoding.")
 
 # --- DATA STORAGE ---
-students = []  # Each student: {"id", "name", "photo", "encoding"}
-attendance_log = defaultdict(list)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    photo TEXT NOT NULL,
+    enc BLOB NOT NULL,  -- 128 float32 values
+    present_count INTEGER NOT NULL DEFAULT 0,
+    absent_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    student_id INTEGER NOT NULL REFERENCES students(id),
+    date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    UNIQUE (student_id, date, status)
+);
+"""
+
+_db = threading.local()
+
+def get_db():
+    """Return this thread's SQLite connection, reopening it after a fork."""
+    if getattr(_db, "pid", None) != os.getpid():
+        _db.conn = sqlite3.connect(DB_PATH, timeout=30)
+        _db.conn.execute("PRAGMA synchronous=NORMAL")
+        _db.pid = os.getpid()
+    return _db.conn
+
+def init_db():
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    conn.close()
+
+init_db()
+
+# In-process copy of every student's encoding, reloaded when the students table changes
+known_encodings = np.empty((0, 128), dtype=np.float32)  # Row i belongs to known_ids[i]
+known_sq_norms = np.empty(0, dtype=np.float32)  # Cached (known_encodings ** 2).sum(1)
+known_ids = []
+known_names = []
+last_frame = {"key": None, "result": None}  # Fingerprint and response of the previous attendance frame
 
 # --- HELPER FUNCTIONS ---
-def get_face_encoding(image_path):
-    """Extract facial encoding from image, return None if no face detected."""
-    img = face_recognition.load_image_file(image_path)
+def _init_encoding_worker():
+    """Load dlib models once per worker process instead of per task."""
+    import face_recognition  # noqa: F401
+
+def _encode_faces(crops):
+    return [face_recognition.face_encodings(crop, [box])[0] for crop, box in crops]
+
+def crop_face(frame, location):
+    """Cut a face out of the frame with half a box of margin, returning the crop and the box inside it.
+
+    The margin keeps the landmarks and the aligned face chip within the crop, so
+    only this region has to be pickled to a pool worker instead of the full frame.
+    """
+    top, right, bottom, left = location
+    pad_y, pad_x = (bottom - top) // 2, (right - left) // 2
+    y0, x0 = max(top - pad_y, 0), max(left - pad_x, 0)
+    y1, x1 = min(bottom + pad_y, frame.shape[0]), min(right + pad_x, frame.shape[1])
+    return np.ascontiguousarray(frame[y0:y1, x0:x1]), (top - y0, right - x0, bottom - y0, left - x0)
+
+_encoding_pool = None
+_encoding_pool_pid = None
+
+def get_encoding_pool():
+    """Create the encoding pool on first use in each process.
+
+    With gunicorn --preload the app is imported once and then forked; a pool
+    created at import time would share its queues across server workers.
+    """
+    global _encoding_pool, _encoding_pool_pid
+    if _encoding_pool is None or _encoding_pool_pid != os.getpid():
+        _encoding_pool = ProcessPoolExecutor(max_workers=ENCODING_WORKERS, initializer=_init_encoding_worker)
+        _encoding_pool_pid = os.getpid()
+    return _encoding_pool
+
+def encode_faces_parallel(frame, locations):
+    """Encode detected faces, spreading them across the worker pool when there are several.
+
+    With CUDA the encoder already runs on the GPU, and forked workers could not
+    use the inherited CUDA context anyway, so encoding always stays in-process.
+    """
+    if len(locations) < 2 or ENCODING_WORKERS == 1 or dlib.DLIB_USE_CUDA:
+        return face_recognition.face_encodings(frame, locations)
+    n_chunks = min(ENCODING_WORKERS, len(locations))
+    crops = [crop_face(frame, loc) for loc in locations]
+    pool = get_encoding_pool()
+    futures = [pool.submit(_encode_faces, crops[i::n_chunks]) for i in range(n_chunks)]
+    encodings = [None] * len(locations)
+    for i, future in enumerate(futures):
+        encodings[i::n_chunks] = future.result()
+    return encodings
+
+def get_face_encoding(img_bytes):
+    """Extract facial encoding from encoded image bytes, return None if no face detected."""
+    img = np.ascontiguousarray(Image.open(io.BytesIO(img_bytes)).convert("RGB"))
     encodings = face_recognition.face_encodings(img)
     return encodings[0] if encodings else None
 
-def mark_attendance(student_id, status):
-    """Mark student attendance only once per day."""
-    today = datetime.now().strftime("%Y-%m-%d")
-    if status == "Present" and any(log["date"] == today and log["status"] == "Present" for log in attendance_log[student_id]):
+
+def refresh_known_faces():
+    """Reload known encodings if students were registered since the last load (possibly by another worker)."""
+    global known_encodings, known_sq_norms, known_ids, known_names
+    conn = get_db()
+    latest_id = conn.execute("SELECT MAX(id) FROM students").fetchone()[0]
+    if latest_id == (known_ids[-1] if known_ids else None):
         return
-    attendance_log[student_id].append({"status": status, "date": today})
+    rows = conn.execute("SELECT id, name, enc FROM students ORDER BY id").fetchall()
+    known_ids = [r[0] for r in rows]
+    known_names = [r[1] for r in rows]
+    known_encodings = np.frombuffer(b"".join(r[2] for r in rows), dtype=np.float32).reshape(-1, 128).copy()
+    known_sq_norms = (known_encodings ** 2).sum(1)
+
+def mark_attendance(student_ids, status):
+    """Mark attendance for the given students; the UNIQUE constraint keeps it once per day."""
+    today = datetime.now().strftime("%Y-%m-%d")
+    counter = "present_count" if status == "Present" else "absent_count"
+    conn = get_db()
+    with conn:
+        for student_id in student_ids:
+            cur = conn.execute("INSERT OR IGNORE INTO attendance (student_id, date, status) VALUES (?, ?, ?)",
+                               (student_id, today, status))
+            if cur.rowcount:
+                conn.execute(f"UPDATE students SET {counter} = {counter} + 1 WHERE id = ?", (student_id,))
+
+def get_history(student_id):
+    rows = get_db().execute("SELECT date, status FROM attendance WHERE student_id = ? ORDER BY rowid",
+                            (student_id,)).fetchall()
+    return [{"date": date, "status": status} for date, status in rows]
+
+# Serial on purpose: with a few probes and <SMALL_GALLERY rows a thread fan-out is pure
+# overhead, and Numba's threading layer keeps the process from exiting once the
+# encoding pool has forked.
+@njit("f4[:,:](f4[:,::1], f4[:,::1])", fastmath=True, cache=True)
+def squared_distances(known, probes):
+    """Squared L2 distance between every known encoding (rows) and every probe (columns)."""
+    n, f, dim = known.shape[0], probes.shape[0], known.shape[1]
+    out = np.empty((n, f), dtype=np.float32)
+    for i in range(n):
+        for j in range(f):
+            s = np.float32(0.0)
+            for k in range(dim):
+                d = known[i, k] - probes[j, k]
+                s += d * d
+            out[i, j] = s
+    return out
+
+def match_faces(face_encodings, tolerance=0.6):
+    """Return the known_encodings row matched by each probe encoding, or None if no match."""
+    if not face_encodings or not len(known_encodings):
+        return [None] * len(face_encodings)
+    probes = np.ascontiguousarray(face_encodings, dtype=known_encodings.dtype)
+    if len(known_encodings) < SMALL_GALLERY:
+        d2 = squared_distances(known_encodings, probes)
+    else:
+        d2 = known_sq_norms[:, None] + (probes ** 2).sum(1)[None, :] - 2 * known_encodings @ probes.T
+    best = np.argmin(d2, axis=0)
+    hits = d2[best, np.arange(len(probes))] < tolerance ** 2
+    return [int(i) if hit else None for i, hit in zip(best, hits)]
+
+def tally_attendance(history, unit="D"):
+    """Count Present/Absent entries per day ("D") or month ("M"), sorted by period."""
+    dates = np.array([log["date"] for log in history], dtype="datetime64[D]").astype(f"datetime64[{unit}]")
+    present = np.array([log["status"] == "Present" for log in history], dtype=np.uint8)
+    periods, inverse = np.unique(dates, return_inverse=True)
+    present_counts = np.bincount(inverse, weights=present, minlength=len(periods)).astype(int)
+    absent_counts = np.bincount(inverse, minlength=len(periods)) - present_counts
+    return periods.astype(str).tolist(), present_counts.tolist(), absent_counts.tolist()
+
+@lru_cache(maxsize=256)
+def render_attendance_graph(student_id, student_name, view, history_fingerprint):
+    """Render the attendance bar chart as PNG bytes.
+
+    history_fingerprint changes whenever the student's log grows, so cached
+    charts are never served for stale history.
+    """
+    history = get_history(student_id)
+
+    if view == "monthly":
+        labels, present_counts, absent_counts = tally_attendance(history, "M")
+        title = f"Monthly Attendance for {student_name}"
+    else:
+        labels, present_counts, absent_counts = tally_attendance(history, "D")
+        title = f"Daily Attendance for {student_name}"
+
+    return draw_stacked_bar_chart(labels, present_counts, absent_counts, title,
+                                  "Date" if view == "daily" else "Month")
+
+def draw_stacked_bar_chart(labels, present_counts, absent_counts, title, xlabel):
+    """Draw a Present/Absent stacked bar chart with Pillow and return PNG bytes."""
+    width, height = 600, 400
+    left, right, top, bottom = 60, 20, 40, 100
+    plot_w, plot_h = width - left - right, height - top - bottom
+    x_axis_y = top + plot_h
+
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+
+    def text_size(text):
+        box = draw.textbbox((0, 0), text, font=font)
+        return box[2], box[3]
+
+    tw, _ = text_size(title)
+    draw.text(((width - tw) / 2, 12), title, fill="black", font=font)
+
+    # Y axis with integer ticks
+    max_total = max((p + a for p, a in zip(present_counts, absent_counts)), default=0) or 1
+    scale = plot_h / max_total
+    step = max(1, math.ceil(max_total / 5))
+    for tick in range(0, max_total + 1, step):
+        y = x_axis_y - tick * scale
+        draw.line([(left - 4, y), (left, y)], fill="black")
+        label = str(tick)
+        lw, lh = text_size(label)
+        draw.text((left - 8 - lw, y - lh / 2), label, fill="black", font=font)
+    draw.line([(left, top), (left, x_axis_y)], fill="black")
+    draw.line([(left, x_axis_y), (left + plot_w, x_axis_y)], fill="black")
+
+    ylabel = Image.new("RGBA", text_size("Count"), (255, 255, 255, 0))
+    ImageDraw.Draw(ylabel).text((0, 0), "Count", fill="black", font=font)
+    ylabel = ylabel.rotate(90, expand=True)
+    img.paste(ylabel, (8, top + (plot_h - ylabel.height) // 2), ylabel)
+    xw, _ = text_size(xlabel)
+    draw.text((left + (plot_w - xw) / 2, height - 18), xlabel, fill="black", font=font)
+
+    # Bars, with tick labels slanted like the old rotation=45 layout
+    slot = plot_w / max(len(labels), 1)
+    bar_w = min(slot * 0.8, 60)
+    for i, (label, present, absent) in enumerate(zip(labels, present_counts, absent_counts)):
+        cx = left + slot * (i + 0.5)
+        x0, x1 = cx - bar_w / 2, cx + bar_w / 2
+        present_top = x_axis_y - present * scale
+        if present:
+            draw.rectangle([x0, present_top, x1, x_axis_y], fill="green")
+        if absent:
+            draw.rectangle([x0, present_top - absent * scale, x1, present_top], fill="red")
+
+        tick_label = Image.new("RGBA", text_size(label), (255, 255, 255, 0))
+        ImageDraw.Draw(tick_label).text((0, 0), label, fill="black", font=font)
+        tick_label = tick_label.rotate(45, expand=True)
+        img.paste(tick_label, (int(cx - tick_label.width), x_axis_y + 4), tick_label)
+
+    # Legend, above the plot area so it never covers a bar
+    lx = left + plot_w - 130
+    for name, color in (("Present", "green"), ("Absent", "red")):
+        draw.rectangle([lx, 24, lx + 10, 34], fill=color)
+        draw.text((lx + 14, 23), name, fill="black", font=font)
+        lx += 70
+
+    buf = io.BytesIO()
+    img.save(buf, "PNG", optimize=False, compress_level=1)
+    return buf.getvalue()
 
 # --- ROUTES ---
 @app.route("/register", methods=["POST"])
@@ -53,21 +323,23 @@ def register_student():
         ext = os.path.splitext(student_photo.filename)[1]
         filename = secure_filename(f"{uuid.uuid4()}{ext}")
         filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        student_photo.save(filepath)
+        img_bytes = student_photo.read()
 
-        encoding = get_face_encoding(filepath)
+        try:
+            encoding = get_face_encoding(img_bytes)
+        except UnidentifiedImageError:
+            return jsonify({"error": "Failed to read image"}), 400
         if encoding is None:
-            os.remove(filepath)
             return jsonify({"error": "No face detected. Upload a clear front-facing photo."}), 400
+        with open(filepath, "wb") as f:
+            f.write(img_bytes)
 
-        student_id = len(students) + 1
-        students.append({
-            "id": student_id,
-            "name": student_name,
-            "photo": filename,
-            "encoding": encoding.tolist()
-        })
-        attendance_log[student_id] = []
+        conn = get_db()
+        with conn:
+            cur = conn.execute("INSERT INTO students (name, photo, enc) VALUES (?, ?, ?)",
+                               (student_name, filename, encoding.astype(np.float32).tobytes()))
+        student_id = cur.lastrowid
+        refresh_known_faces()
 
         return jsonify({"message": f"✅ {student_name} registered successfully!", "id": student_id}), 200
     except Exception as e:
@@ -76,7 +348,8 @@ def register_student():
 @app.route("/take_attendance", methods=["POST"])
 def take_attendance():
     try:
-        if not students:
+        refresh_known_faces()
+        if not known_ids:
             return jsonify({"error": "No students registered"}), 400
 
         file = request.files.get("frame")
@@ -84,49 +357,53 @@ def take_attendance():
             return jsonify({"error": "No frame uploaded"}), 400
 
         img_bytes = file.read()
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-        if frame is None:
+        # Ignore EXIF orientation so box coordinates line up with the Pillow-decoded full frame
+        small_frame = cv2.imdecode(np.frombuffer(img_bytes, np.uint8),
+                                   DETECTION_IMREAD_FLAG | cv2.IMREAD_IGNORE_ORIENTATION)
+        if small_frame is None:
             return jsonify({"error": "Failed to read image"}), 400
-
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_locations = face_recognition.face_locations(rgb_frame)
-        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-        present_students = []
-        absent_students = [s["name"] for s in students]
-
-        for face_encoding in face_encodings:
-            matches = face_recognition.compare_faces(
-                [np.array(s["encoding"]) for s in students],
-                face_encoding,
-                tolerance=0.6
-            )
-            if True in matches:
-                idx = matches.index(True)
-                student = students[idx]
-                if student["name"] not in present_students:
-                    present_students.append(student["name"])
-                    if student["name"] in absent_students:
-                        absent_students.remove(student["name"])
-                    mark_attendance(student["id"], "Present")
-
-        # Mark absent for remaining students
-        for student in students:
-            if student["name"] not in present_students:
-                mark_attendance(student["id"], "Absent")
-
-        return jsonify({
-            "present_students": present_students,
-            "absent_students": absent_students
-        })
+        small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+        # Identical consecutive frames (class standing still) reuse the previous result
+        thumb = cv2.resize(cv2.cvtColor(small_frame, cv2.COLOR_RGB2GRAY), (32, 32), interpolation=cv2.INTER_AREA)
+        frame_key = (xxhash.xxh3_64_intdigest(thumb.tobytes()), len(known_ids), datetime.now().strftime("%Y-%m-%d"))
+        if frame_key == last_frame["key"]:
+            return jsonify(last_frame["result"])
+
+        face_locations = [
+            tuple(v * DETECTION_SCALE for v in loc)
+            for loc in face_recognition.face_locations(small_frame, model=FACE_MODEL)
+        ]
+        # Encodings still use the full-resolution frame, decoded only when there are faces to encode
+        if face_locations:
+            rgb_frame = np.ascontiguousarray(Image.open(io.BytesIO(img_bytes)).convert("RGB"))
+            face_encodings = encode_faces_parallel(rgb_frame, face_locations)
+        else:
+            face_encodings = []
+
+        present_rows = []
+        for idx in match_faces(face_encodings, tolerance=0.6):
+            if idx is not None and idx not in present_rows:
+                present_rows.append(idx)
+        present_set = set(present_rows)
+        absent_rows = [i for i in range(len(known_ids)) if i not in present_set]
+
+        mark_attendance([known_ids[i] for i in present_rows], "Present")
+        mark_attendance([known_ids[i] for i in absent_rows], "Absent")
+
+        result = {
+            "present_students": [known_names[i] for i in present_rows],
+            "absent_students": [known_names[i] for i in absent_rows]
+        }
+        last_frame["key"], last_frame["result"] = frame_key, result
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": f"Attendance failed: {str(e)}"}), 500
 
 @app.route("/students", methods=["GET"])
 def get_students():
-    return jsonify([{"id": s["id"], "name": s["name"], "photo": s["photo"]} for s in students])
+    rows = get_db().execute("SELECT id, name, photo FROM students ORDER BY id").fetchall()
+    return jsonify([{"id": r[0], "name": r[1], "photo": r[2]} for r in rows])
 
 @app.route("/get_attendance_graph", methods=["GET"])
 def get_attendance_graph():
@@ -134,44 +411,15 @@ def get_attendance_graph():
     student_name = request.args.get("student_name", default="Student")
     view = request.args.get("view", default="daily")  # "daily" or "monthly"
 
-    if student_id not in attendance_log:
+    conn = get_db()
+    if student_id is None or not conn.execute("SELECT 1 FROM students WHERE id = ?", (student_id,)).fetchone():
         return jsonify({"error": "Student not found"}), 404
 
-    history = attendance_log[student_id]
-
-    if view == "monthly":
-        date_status = defaultdict(lambda: {"Present": 0, "Absent": 0})
-        for log in history:
-            month = log["date"][:7]
-            date_status[month][log["status"]] += 1
-        labels = sorted(date_status.keys())
-        present_counts = [date_status[m]["Present"] for m in labels]
-        absent_counts = [date_status[m]["Absent"] for m in labels]
-        title = f"Monthly Attendance for {student_name}"
-    else:
-        date_status = defaultdict(lambda: {"Present": 0, "Absent": 0})
-        for log in history:
-            date_status[log["date"]][log["status"]] += 1
-        labels = sorted(date_status.keys())
-        present_counts = [date_status[d]["Present"] for d in labels]
-        absent_counts = [date_status[d]["Absent"] for d in labels]
-        title = f"Daily Attendance for {student_name}"
-
-    plt.figure(figsize=(6, 4))
-    plt.bar(labels, present_counts, label="Present", color="green")
-    plt.bar(labels, absent_counts, bottom=present_counts, label="Absent", color="red")
-    plt.xticks(rotation=45, ha='right')
-    plt.title(title)
-    plt.xlabel("Date" if view == "daily" else "Month")
-    plt.ylabel("Count")
-    plt.legend()
-    plt.tight_layout()
-
-    img = io.BytesIO()
-    plt.savefig(img, format="png")
-    img.seek(0)
-    plt.close()
-    return send_file(img, mimetype="image/png")
+    count, last_date = conn.execute("SELECT COUNT(*), MAX(date) FROM attendance WHERE student_id = ?",
+                                    (student_id,)).fetchone()
+    fingerprint = (count, last_date or "")
+    png = render_attendance_graph(student_id, student_name, view, fingerprint)
+    return send_file(io.BytesIO(png), mimetype="image/png")
 
 @app.route("/send_report", methods=["POST"])
 def send_report():
@@ -181,27 +429,27 @@ def send_report():
         student_id = data.get("student_id")
         recipient_type = data.get("recipient_type")  # "parent" or "management"
 
-        if not student_id or student_id not in attendance_log:
+        row = get_db().execute("SELECT name, present_count, absent_count FROM students WHERE id = ?",
+                               (student_id,)).fetchone() if student_id else None
+        if row is None:
             return jsonify({"error": "Invalid student"}), 400
 
-        student = students[student_id - 1]
-        logs = attendance_log[student_id]
+        student_name, total_present, total_absent = row
+        logs = get_history(student_id)
 
         # Generate PDF
-        pdf_filename = f"Attendance_Report_{student['name'].replace(' ', '_')}.pdf"
+        pdf_filename = f"Attendance_Report_{student_name.replace(' ', '_')}.pdf"
         pdf_path = os.path.join(app.config["UPLOAD_FOLDER"], pdf_filename)
 
         c = canvas.Canvas(pdf_path, pagesize=A4)
         c.setFont("Helvetica-Bold", 16)
-        c.drawString(50, 800, f"Attendance Report - {student['name']}")
+        c.drawString(50, 800, f"Attendance Report - {student_name}")
 
         c.setFont("Helvetica", 12)
         c.drawString(50, 780, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         c.drawString(50, 760, f"Recipient: {'Parent' if recipient_type == 'parent' else 'Management'}")
 
-        total_present = sum(1 for log in logs if log["status"] == "Present")
-        total_absent = sum(1 for log in logs if log["status"] == "Absent")
-        percentage = (total_present / max(len(logs), 1)) * 100
+        percentage = (total_present / max(total_present + total_absent, 1)) * 100
 
         c.drawString(50, 730, f"Total Present: {total_present}")
         c.drawString(50, 710, f"Total Absent: {total_absent}")
@@ -210,15 +458,17 @@ def send_report():
         c.setFont("Helvetica-Bold", 14)
         c.drawString(50, 660, "Detailed Attendance:")
 
-        c.setFont("Helvetica", 12)
-        y = 640
+        # One text object per page; lines share its font state instead of a drawString each
+        text = c.beginText(50, 640)
+        text.setFont("Helvetica", 12, leading=20)
         for log in logs:
-            c.drawString(50, y, f"{log['date']} - {log['status']}")
-            y -= 20
-            if y < 50:
+            if text.getY() < 50:
+                c.drawText(text)
                 c.showPage()
-                c.setFont("Helvetica", 12)
-                y = 800
+                text = c.beginText(50, 800)
+                text.setFont("Helvetica", 12, leading=20)
+            text.textLine(f"{log['date']} - {log['status']}")
+        c.drawText(text)
 
         c.save()
 
@@ -227,6 +477,7 @@ def send_report():
         return jsonify({"error": f"Failed to generate report: {str(e)}"}), 500
 
 if __name__ == "__main__":
+    # Development server only; in production run: gunicorn -c gunicorn.conf.py backend_app:app
     print("✅ Backend running at http://127.0.0.1:5000")
     app.run(debug=True)
 
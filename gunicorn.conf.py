@@ -0,0 +1,21 @@
+# gunicorn -c gunicorn.conf.py backend_app:app
+import os
+
+bind = "127.0.0.1:5000"
+
+# Import backend_app (and the dlib models) once in the master, then fork workers
+# so they share the loaded model pages copy-on-write.
+preload_app = True
+
+worker_class = "gthread"
+threads = 1
+
+# Students and attendance live in SQLite, so any number of workers see the same roster.
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+# Each worker runs its own face-encoding pool; split the cores between them so
+# workers * ENCODING_WORKERS stays at the CPU count. Read by backend_app at import.
+os.environ.setdefault("ENCODING_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+# Face detection on a large frame can take a few seconds on CPU.
+timeout = 60